@@ -0,0 +1,202 @@
+import json
+from pathlib import Path
+
+import polars as pl
+
+from rdfq.core.quads import quad_cols
+
+bit_masks = {i: 1 << i for i in range(8)}
+
+
+class QuadFilter:
+    """A Bloom filter over `(subject, predicate, object, graph)` of fixed memory size.
+
+    The bit array is held as a `UInt8` Series of `n_bits // 8` bytes, so memory stays
+    bounded no matter how many rows pass through it. Bit positions are derived by
+    double hashing the two seeded Polars row hashes of the quad. A false positive
+    drops a quad that was not actually seen before, at a rate governed by `n_bits`,
+    `n_hashes` and the number of distinct quads inserted (the default 1 GiB filter
+    with 7 hashes stays under 0.1% up to ~500M distinct quads). The count of bits set
+    gives an estimate of that rate, and `dedup` halts once it passes `max_fp_rate`
+    rather than drop unseen quads from the dataset.
+
+    Polars hashes are not stable across Polars versions, so a saved filter records the
+    Polars version that wrote it and refuses to be resumed by any other.
+    """
+
+    def __init__(self, n_bits: int = 2**33, n_hashes: int = 7):
+        assert n_bits % 8 == 0, f"n_bits must be a multiple of 8 (got {n_bits})"
+        self.n_bits = n_bits
+        self.n_hashes = n_hashes
+        self.bits = pl.zeros(n_bits // 8, dtype=pl.UInt8, eager=True)
+        self.bits_set = 0
+        self.chunks: list[str] = []  # Names of the chunks inserted so far
+        self.chunk_counts: dict[str, tuple[int, int]] = {}  # Rows in/out per chunk
+
+    @property
+    def rows_in(self) -> int:
+        return sum(rows_in for rows_in, _ in self.chunk_counts.values())
+
+    @property
+    def rows_out(self) -> int:
+        return sum(rows_out for _, rows_out in self.chunk_counts.values())
+
+    @property
+    def dedup_rate(self) -> float:
+        """Fraction of the rows passed to `dedup` that were removed as duplicates."""
+        return 1 - self.rows_out / self.rows_in if self.rows_in else 0.0
+
+    @property
+    def fp_rate(self) -> float:
+        """Estimated false positive rate: the chance that all `n_hashes` bits of a quad
+        not seen before are already set.
+        """
+        return (self.bits_set / self.n_bits) ** self.n_hashes
+
+    def _bit_positions(self, df: pl.DataFrame) -> pl.DataFrame:
+        """Long frame of (row, byte, mask) with `n_hashes` entries per row of `df`."""
+        key = pl.struct(quad_cols)
+        h1 = key.hash(seed=0) % self.n_bits
+        h2 = key.hash(seed=1) % (self.n_bits - 1) + 1  # Never 0, else all k collide
+        return (
+            df.select(
+                row=pl.int_range(pl.len(), dtype=pl.UInt32),
+                pos=pl.concat_list(
+                    [(h1 + i * h2) % self.n_bits for i in range(self.n_hashes)]
+                ),
+            )
+            .explode("pos")
+            .select(
+                "row",
+                byte=pl.col("pos") // 8,
+                mask=(pl.col("pos") % 8).replace_strict(
+                    bit_masks, return_dtype=pl.UInt8
+                ),
+            )
+        )
+
+    def _set_bits(self, positions: pl.DataFrame) -> None:
+        masks = positions.group_by("byte").agg(pl.col("mask").bitwise_or())
+        old = self.bits.gather(masks["byte"])
+        new = old | masks["mask"]
+        self.bits_set += new.bitwise_count_ones().sum() - old.bitwise_count_ones().sum()
+        self.bits.scatter(masks["byte"], new)
+
+    def update(self, df: pl.DataFrame, chunk: str) -> None:
+        """Insert every quad in `df` without filtering (e.g. a chunk already cached)."""
+        self._set_bits(self._bit_positions(df))
+        self.chunks.append(chunk)
+
+    def dedup(
+        self, df: pl.DataFrame, chunk: str, max_fp_rate: float = 0.01
+    ) -> pl.DataFrame:
+        """Drop quads repeated within `df` or (probably) seen in an earlier chunk.
+        Halt if the filter is so full that over `max_fp_rate` of new quads would be
+        dropped.
+        """
+        assert self.fp_rate < max_fp_rate, (
+            f"Filter saturated: ~{self.fp_rate:.2%} of unseen quads in {chunk} would be"
+            f" dropped as duplicates, rerun with more bits than n_bits={self.n_bits}"
+        )
+        rows_in = len(df)
+        df = df.unique(subset=quad_cols, maintain_order=True)  # Exact within a chunk
+        positions = self._bit_positions(df)
+        seen = (
+            positions.with_columns(
+                hit=(self.bits.gather(positions["byte"]) & positions["mask"]) > 0
+            )
+            .group_by("row", maintain_order=True)
+            .agg(pl.col("hit").all())
+            .get_column("hit")
+        )
+        df = df.filter(~seen)
+        self._set_bits(positions)
+        self.chunks.append(chunk)
+        self.chunk_counts[chunk] = (rows_in, len(df))
+        return df
+
+    def log_counts(self, filter_dir: Path, chunk: str) -> None:
+        """Append a deduplicated chunk's row counts to `filter_dir`, so that they still
+        count towards `dedup_rate` if the chunk is re-inserted from the cache on resume.
+        """
+        filter_dir.mkdir(exist_ok=True)
+        rows_in, rows_out = self.chunk_counts[chunk]
+        entry = {"chunk": chunk, "rows_in": rows_in, "rows_out": rows_out}
+        with open(filter_dir / "counts.jsonl", "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def save(self, filter_dir: Path) -> None:
+        """Write the bit array and the filter state to `filter_dir`. Each is written to
+        a `.partial` file then renamed into place, and the bit array gets a new name
+        per save (removing the last only once the new state is in place), so an
+        interrupted save leaves the previous filter intact.
+        """
+        filter_dir.mkdir(exist_ok=True)
+        bits_path = filter_dir / f"bits-{len(self.chunks)}.arrow"
+        partial_path = bits_path.with_suffix(".partial")
+        pl.DataFrame({"bits": self.bits}).write_ipc(partial_path)
+        partial_path.rename(bits_path)
+        state = {
+            "polars_version": pl.__version__,
+            "n_bits": self.n_bits,
+            "n_hashes": self.n_hashes,
+            "bits": bits_path.name,
+            "bits_set": self.bits_set,
+            "chunks": self.chunks,
+        }
+        partial_path = filter_dir / "state.partial"
+        partial_path.write_text(json.dumps(state))
+        partial_path.rename(filter_dir / "state.json")
+        for old_bits_path in filter_dir.glob("bits-*.arrow"):
+            if old_bits_path != bits_path:
+                old_bits_path.unlink()
+
+    @classmethod
+    def load(
+        cls, filter_dir: Path, n_bits: int = 2**33, n_hashes: int = 7
+    ) -> "QuadFilter":
+        """Resume a filter saved in `filter_dir`, or make a new empty one if none is,
+        with the row counts of every chunk deduplicated so far (even since the last
+        save).
+        """
+        if (filter_dir / "state.json").exists():
+            quad_filter = cls._load_state(filter_dir, n_bits=n_bits, n_hashes=n_hashes)
+        else:
+            quad_filter = cls(n_bits=n_bits, n_hashes=n_hashes)
+        counts_path = filter_dir / "counts.jsonl"
+        if counts_path.exists():
+            for line in counts_path.read_text().splitlines():
+                entry = json.loads(line)
+                quad_filter.chunk_counts[entry["chunk"]] = (
+                    entry["rows_in"],
+                    entry["rows_out"],
+                )
+        return quad_filter
+
+    @classmethod
+    def _load_state(cls, filter_dir: Path, n_bits: int, n_hashes: int) -> "QuadFilter":
+        state_path = filter_dir / "state.json"
+        state = json.loads(state_path.read_text())
+        saved_version = state.get("polars_version")
+        if saved_version != pl.__version__:
+            raise RuntimeError(
+                f"Filter in {filter_dir} was saved by Polars {saved_version} but this"
+                f" is Polars {pl.__version__}, whose hashes may differ: delete it to"
+                " rebuild"
+            )
+        if (state["n_bits"], state["n_hashes"]) != (n_bits, n_hashes):
+            raise RuntimeError(
+                f"Filter in {filter_dir} has n_bits={state['n_bits']} and n_hashes="
+                f"{state['n_hashes']} but n_bits={n_bits} and n_hashes={n_hashes} were"
+                " requested: delete it to rebuild, or resume with the same sizes"
+            )
+        quad_filter = cls.__new__(cls)
+        quad_filter.n_bits = state["n_bits"]
+        quad_filter.n_hashes = state["n_hashes"]
+        # Read from bytes: a memory-mapped array would be overwritten by `save`
+        bits = pl.read_ipc((filter_dir / state["bits"]).read_bytes())
+        quad_filter.bits = bits.get_column("bits")
+        quad_filter.bits_set = state["bits_set"]
+        quad_filter.chunks = state["chunks"]
+        quad_filter.chunk_counts = {}
+        return quad_filter
@@ -1,2 +1,3 @@
 domain_capture = r"https?://([^/?]+)"
+graph_domain_capture = r"^<https?://([^/?#:>]+)"  # N-Quads graph IRI, without port
 subpage_capture = r"https?://[^/]+(\/[^/?]+\/)"  # Include pre/suffix slashes
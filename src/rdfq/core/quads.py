@@ -0,0 +1 @@
+quad_cols = ["subject", "predicate", "object", "graph"]
@@ -0,0 +1,152 @@
+import random
+from pathlib import Path
+
+import polars as pl
+from huggingface_hub import HfFileSystem
+
+from rdfq.core.caching import make_cache_path
+from rdfq.core.configs import map_file_configs
+from rdfq.core.filters import graph_domain_capture
+from rdfq.core.terms import quad_schema
+
+default_dataset_id = "permutans/wdc-common-crawl-embedded-jsonld"
+
+prefixes = {
+    "rdf": ["http://www.w3.org/1999/02/22-rdf-syntax-ns#"],
+    "schema": ["http://schema.org/", "https://schema.org/"],  # Markup uses both
+    "xsd": ["http://www.w3.org/2001/XMLSchema#"],
+}
+rdf_type = "<http://www.w3.org/1999/02/22-rdf-syntax-ns#type>"
+
+
+def expand_iris(terms: list[str]) -> list[str]:
+    """Expand CURIEs like `schema:NewsArticle` and full IRIs (bare or in angle brackets)
+    to N-Quads IRI terms, one per namespace IRI of a known prefix (schema.org has both
+    http and https). Raises `ValueError` for a CURIE with an unknown prefix.
+    """
+    iris = []
+    for term in terms:
+        if term.startswith("<"):
+            iri = term.removeprefix("<").removesuffix(">")
+        elif "://" in term:
+            iri = term
+        else:
+            prefix, _, local = term.partition(":")
+            if prefix not in prefixes:
+                raise ValueError(
+                    f"Unknown prefix in {term!r}:"
+                    f" use a full IRI or one of {list(prefixes)}"
+                )
+            iri = prefixes[prefix][0] + local
+        for namespaces in prefixes.values():
+            namespace = next((ns for ns in namespaces if iri.startswith(ns)), None)
+            if namespace is not None:
+                local = iri.removeprefix(namespace)
+                iris.extend(f"<{alt_namespace}{local}>" for alt_namespace in namespaces)
+                break
+        else:
+            iris.append(f"<{iri}>")
+    return iris
+
+
+def mirror_remote_file(url: str, mirror_dir: Path) -> Path:
+    """Download a whole `hf://` file into `mirror_dir` unless already mirrored there."""
+    mirror_path = make_cache_path(url=url, cache_dir=mirror_dir)
+    if not mirror_path.exists():
+        partial_path = mirror_path.with_suffix(".partial")
+        HfFileSystem().get_file(url.removeprefix("hf://"), str(partial_path))
+        partial_path.rename(mirror_path)
+    return mirror_path
+
+
+def dataset_urls(
+    dataset_id: str = default_dataset_id,
+    configs: list[str] | None = None,
+    sample_files: float | None = None,
+    seed: int = 0,
+) -> list[str]:
+    """List the `hf://` URLs of the parquet files in the given configs (all by default),
+    optionally keeping a random `sample_files` fraction of them.
+    """
+    if sample_files is not None and not 0 < sample_files <= 1:
+        raise ValueError(f"sample_files must be in (0, 1], got {sample_files}")
+    files = map_file_configs(dataset_id)
+    if configs is not None:
+        if unknown := set(configs) - set(files["config_name"]):
+            raise ValueError(
+                f"Unknown configs {sorted(unknown)} in {dataset_id}, which has"
+                f" {files['config_name'].unique(maintain_order=True).to_list()}"
+            )
+        files = files.filter(pl.col("config_name").is_in(configs))
+    urls = [f"hf://datasets/{dataset_id}/{name}" for name in files["name"]]
+    if sample_files is not None:
+        k = max(1, round(len(urls) * sample_files))
+        urls = sorted(random.Random(seed).sample(urls, k=k))
+    return urls
+
+
+def scan_dataset(
+    dataset_id: str = default_dataset_id,
+    configs: list[str] | None = None,
+    columns: list[str] | None = None,
+    predicates: list[str] | None = None,
+    types: list[str] | None = None,
+    graph_hosts: list[str] | None = None,
+    sample_files: float | None = None,
+    seed: int = 0,
+    mirror_dir: Path | None = None,
+) -> pl.LazyFrame:
+    """Lazily scan the published dataset, with filters and projection pushed down so
+    only the row groups and columns needed are read from the remote parquet files.
+
+    Args:
+        dataset_id: HuggingFace dataset repo to read.
+        configs: Config (subset) names to read, all of them if `None`.
+        columns: Columns to project, all of them if `None`. The decomposed `object_*`
+                 columns are null in files written without them.
+        predicates: Keep only quads with these predicates (CURIEs or IRIs).
+        types: Keep only quads whose subject has one of these `rdf:type`s (in the same
+               graph), e.g. `["schema:NewsArticle"]`.
+        graph_hosts: Keep only quads whose graph (page URL) is on one of these hosts
+                     (matched case-insensitively, on any port).
+        sample_files: Fraction of the files to read (sampled by `seed`).
+        seed: Random seed for `sample_files`.
+        mirror_dir: If given, download every selected file in full into this dir when
+                    called (before any filter or projection applies) and scan the
+                    local copies. Narrow the selection with `configs` or
+                    `sample_files` first, as this mirrors whole configs.
+
+    Returns:
+        LazyFrame over the matching quads.
+
+    Raises:
+        ValueError: If any of `configs` is not in the dataset, `sample_files` is not in
+                    (0, 1], or a CURIE has an unknown prefix.
+    """
+    urls = dataset_urls(
+        dataset_id, configs=configs, sample_files=sample_files, seed=seed
+    )
+    if mirror_dir is not None:
+        sources = [str(mirror_remote_file(url, mirror_dir=mirror_dir)) for url in urls]
+    else:
+        sources = urls
+    # Only configs written with `decompose_objects` have the `object_*` columns
+    lf = pl.scan_parquet(
+        sources, schema=quad_schema, missing_columns="insert", extra_columns="ignore"
+    )
+    if graph_hosts is not None:
+        # Hosts are case-insensitive, so compare them lowercased
+        graph_host = pl.col("graph").str.extract(graph_domain_capture)
+        graph_host = graph_host.str.to_lowercase()
+        lf = lf.filter(graph_host.is_in([host.lower() for host in graph_hosts]))
+    if types is not None:
+        typed = lf.filter(
+            pl.col("predicate") == rdf_type,
+            pl.col("object").is_in(expand_iris(types)),
+        ).select("subject", "graph")
+        lf = lf.join(typed, on=["subject", "graph"], how="semi")
+    if predicates is not None:
+        lf = lf.filter(pl.col("predicate").is_in(expand_iris(predicates)))
+    if columns is not None:
+        lf = lf.select(columns)
+    return lf
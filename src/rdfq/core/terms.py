@@ -0,0 +1,129 @@
+import re
+
+import polars as pl
+
+from rdfq.core.quads import quad_cols
+
+xsd = "http://www.w3.org/2001/XMLSchema#"
+date_types = [f"{xsd}date", f"{xsd}dateTime"]
+number_types = [
+    f"{xsd}{name}"
+    for name in [
+        "integer",
+        "int",
+        "long",
+        "short",
+        "decimal",
+        "double",
+        "float",
+        "nonNegativeInteger",
+        "positiveInteger",
+    ]
+]
+
+term_kind = pl.Enum(["iri", "blank", "literal"])
+object_schema = {
+    "object_kind": term_kind,
+    "object_value": pl.String,
+    "object_lang": pl.Categorical,
+    "object_datatype": pl.Categorical,
+    "object_date": pl.Date,
+    "object_number": pl.Float64,
+}
+# Every column a published file may have (the decomposed ones only with the option set)
+quad_schema = {col: pl.String for col in quad_cols} | object_schema
+
+# Lexical form, then either a language tag (WDC also emit `@*`) or a datatype IRI
+literal_pat = (
+    r'(?s)^"(?P<lexical>.*)"(?:@(?P<lang>[a-zA-Z0-9-]+|\*)|\^\^<(?P<datatype>[^>]+)>)?$'
+)
+
+
+# JSON has no `\UXXXXXXXX` escape: those in the BMP can be rewritten as `\uXXXX`, but
+# the rest (whose UTF-16 surrogate pairs can't be made by string replacement) can't be
+bmp_escape = "\\U0000"
+# An unescaped backslash (after an even number of them) then a `\U` beyond U+FFFF
+astral_escape_pat = r"(?:^|[^\\])(?:\\\\)*\\U(?:000[1-9A-Fa-f]|0010)"
+# Escaped backslashes are matched as a pair, so `\\U...` is never read as `\U...`
+astral_escape_re = re.compile(
+    r"\\\\|\\U(000[1-9A-Fa-f][0-9A-Fa-f]{4}|0010[0-9A-Fa-f]{4})"
+)
+# JSON also forbids raw control characters, which N-Triples literals may contain
+control_escapes = {chr(code): f"\\u{code:04x}" for code in range(0x20)}
+
+
+def unescape_astral(lexical: str) -> str:
+    """Replace the `\\UXXXXXXXX` escapes beyond U+FFFF in a lexical form with the
+    characters they encode, leaving every other escape as it is.
+    """
+    return astral_escape_re.sub(lambda m: chr(int(m[1], 16)) if m[1] else m[0], lexical)
+
+
+def decode_escapes(quoted: pl.Expr) -> pl.Expr:
+    """Decode the N-Triples escapes in a quoted string literal (including its quotes).
+
+    N-Triples escapes are JSON's plus `\\'` and `\\UXXXXXXXX`, so after rewriting `\\'`,
+    BMP `\\U0000XXXX` escapes and raw control characters the literal parses as a JSON
+    string. Those beyond U+FFFF (e.g. emoji) must be unescaped first by
+    `unescape_astral`. Null if the literal has invalid escapes in the source markup.
+    """
+    # Escaped backslashes are replaced as a pair, so `\\U...` is never read as `\U...`
+    json_safe = quoted.str.replace_many(
+        ["\\\\", "\\'", bmp_escape, *control_escapes],
+        ["\\\\", "'", "\\u", *control_escapes.values()],
+    )
+    return json_safe.str.json_path_match("$")
+
+
+def decompose_object(typed: bool = False) -> list[pl.Expr]:
+    """Expressions splitting the `object` column into its term kind, value (the IRI,
+    blank node label or decoded lexical form), language tag and datatype. If `typed`,
+    also parse date and numeric literals into `object_date` and `object_number`.
+
+    Every literal's `object_value` is its decoded lexical form (with `\\UXXXXXXXX`
+    escapes beyond U+FFFF unescaped in Python first), or its raw lexical form if it has
+    invalid escapes in the source markup.
+    """
+    obj = pl.col("object")
+    literal = obj.str.extract_groups(literal_pat)
+    lexical = literal.struct.field("lexical")
+    datatype = literal.struct.field("datatype")
+    # Rare enough to unescape in Python (only the literals that need it, as others are
+    # null here and so skipped)
+    unescaped = (
+        pl.when(lexical.str.contains(astral_escape_pat))
+        .then(lexical)
+        .map_elements(unescape_astral, return_dtype=pl.String)
+    )
+    quoted = pl.concat_str(pl.lit('"'), pl.coalesce(unescaped, lexical), pl.lit('"'))
+    kind = (
+        pl.when(obj.str.starts_with("<"))
+        .then(pl.lit("iri"))
+        .when(obj.str.starts_with("_:"))
+        .then(pl.lit("blank"))
+        .otherwise(pl.lit("literal"))
+        .cast(term_kind)
+    )
+    value = (
+        pl.when(obj.str.starts_with("<"))
+        .then(obj.str.strip_prefix("<").str.strip_suffix(">"))
+        .when(obj.str.starts_with("_:"))
+        .then(obj.str.strip_prefix("_:"))
+        .otherwise(pl.coalesce(decode_escapes(quoted), lexical))
+    )
+    exprs = [
+        kind.alias("object_kind"),
+        value.alias("object_value"),
+        literal.struct.field("lang").cast(pl.Categorical).alias("object_lang"),
+        datatype.cast(pl.Categorical).alias("object_datatype"),
+    ]
+    if typed:
+        exprs += [
+            pl.when(datatype.is_in(date_types))
+            .then(lexical.str.slice(0, 10).str.to_date("%Y-%m-%d", strict=False))
+            .alias("object_date"),
+            pl.when(datatype.is_in(number_types))
+            .then(lexical.str.strip_chars().cast(pl.Float64, strict=False))
+            .alias("object_number"),
+        ]
+    return exprs
@@ -15,6 +15,9 @@ from huggingface_hub import list_repo_files, login
 from tqdm import tqdm
 
 from rdfq.core.caching import make_cache_path, mktemp_cache_dir
+from rdfq.core.dedup import QuadFilter
+from rdfq.core.quads import quad_cols
+from rdfq.core.terms import decompose_object
 
 # Authentication and dataset configuration
 login(new_session=False)
@@ -72,13 +75,13 @@ def cap_nulls(df: pl.DataFrame, threshold=100) -> pl.DataFrame:
     """If any of the columns have nulls in over `threshold` rows, halt the program.
     Threshold is set to 10. Typically we see at most 2-4 is acceptable (HTML junk)
     """
-    null_rows = df.filter(pl.any_horizontal(pl.all().is_null()))
+    null_rows = df.filter(pl.any_horizontal(pl.col(quad_cols).is_null()))
     if total_nulls := len(null_rows):
         assert (
             total_nulls < threshold
         ), f"{total_nulls} nulls detected, regex may have a bug:\n{null_rows}"
         # print(f"Dropping {len(dropped)} null rows:")
-        df = df.drop_nulls()
+        df = df.drop_nulls(quad_cols)  # Decomposed object columns are sparse
     return df
 
 
@@ -109,8 +112,28 @@ def ds_subset_complete(
 
 
 def process_all_years(
-    repo_path: Path, upload_in_batches: bool = True, batch_size: int = 500
+    repo_path: Path,
+    upload_in_batches: bool = True,
+    batch_size: int = 500,
+    dedup: bool = False,
+    dedup_bits: int = 2**33,
+    decompose_objects: bool = False,
+    typed_objects: bool = False,
 ):
+    """Parse, cache and upload every WDC release in turn.
+
+    If `dedup` is set, quads repeated across the chunks of a release are dropped by a
+    `dedup_bits`-sized Bloom filter, kept in the subset cache dir to resume alongside
+    the parquet chunk cache.
+
+    If `decompose_objects` is set, the `object` column is also split into its term
+    kind, value, language tag and datatype columns (and if `typed_objects`, date and
+    numeric columns too) when each chunk is parsed, or read from the parquet cache
+    without them (e.g. if resuming a run with different options).
+    """
+    assert not typed_objects or decompose_objects, "typed_objects needs decompose"
+    decompose_exprs = decompose_object(typed=typed_objects) if decompose_objects else []
+    chunk_cols = quad_cols + [expr.meta.output_name() for expr in decompose_exprs]
     ld_dir = repo_path / "structureddata"
     cache_dir = mktemp_cache_dir(id_path=repo_id, base_dir=non_tmp_cache_dir)
     # dataset_cache_path = partial(make_cache_path, cache_dir=cache_dir)
@@ -126,6 +149,7 @@ def process_all_years(
         (subset_cache_dir := dataset_pq_cache_dir / subset).mkdir(exist_ok=True)
         (subset_parquet_cache_dir := subset_cache_dir / "parquet").mkdir(exist_ok=True)
         ss_pq_cache_path = partial(make_cache_path, cache_dir=subset_parquet_cache_dir)
+        subset_filter_dir = subset_cache_dir / "dedup"
 
         try:
             urls_df = pl.read_csv(
@@ -145,8 +169,41 @@ def process_all_years(
                 shutil.rmtree(subset_cache_dir)  # subset_parquet_cache_dir
                 continue
 
+            has_filter_state = (subset_filter_dir / "state.json").exists()
+            if dedup and seen > 0 and not has_filter_state:
+                # Uploaded chunks not in a filter cannot be deduplicated against
+                raise RuntimeError(
+                    f"{seen} chunks of {subset} were uploaded without a saved dedup"
+                    " filter (was the run started without dedup?): rewind the remote"
+                    " repo to deduplicate the whole subset, or resume without dedup"
+                )
+            if not dedup and subset_filter_dir.exists():
+                # Chunks left to process would not be deduplicated like those uploaded
+                raise RuntimeError(
+                    f"{subset_filter_dir} holds a dedup filter (was the run started"
+                    " with dedup?): resume with dedup, or delete it and rewind the"
+                    " remote repo to upload the subset without dedup"
+                )
+            quad_filter = (
+                QuadFilter.load(subset_filter_dir, n_bits=dedup_bits) if dedup else None
+            )
             pq_caches = []
 
+            def dedup_chunk(df: pl.DataFrame, fname: str) -> pl.DataFrame:
+                if fname in quad_filter.chunks:
+                    # Its quads are all in the filter, so all would be dropped
+                    raise RuntimeError(
+                        f"{fname} is already in the dedup filter but was not"
+                        " deduplicated (was the remote repo rewound?): delete"
+                        f" {subset_filter_dir} to rebuild the filter"
+                    )
+                df = quad_filter.dedup(df, chunk=fname)
+                print(
+                    f"Deduplicated {subset}: {quad_filter.dedup_rate:.2%} removed"
+                    f" (~{quad_filter.fp_rate:.2%} false positive rate)"
+                )
+                return df
+
             def process_subset_chunk(source_url: str) -> Path:
                 fname = Path(source_url).name
                 parquet_cache_chunk = ss_pq_cache_path(fname)
@@ -158,6 +215,23 @@ def process_all_years(
                     except Exception:
                         print(f"Failed to read {parquet_cache_chunk}")
                         raise
+                    # Only chunks whose row counts were logged were deduplicated
+                    is_undeduped = (
+                        quad_filter is not None
+                        and fname not in quad_filter.chunk_counts
+                    )
+                    if is_undeduped:
+                        # Cached by a run without dedup: deduplicate it now
+                        df = dedup_chunk(df, fname=fname)
+                    elif quad_filter is not None and fname not in quad_filter.chunks:
+                        # Deduplicated since the filter was last saved: re-insert it
+                        quad_filter.update(df, chunk=fname)
+                    if is_undeduped or df.columns != chunk_cols:
+                        # Cached with other decomposition options: redo them to match
+                        df = df.select(quad_cols).with_columns(decompose_exprs)
+                        df.write_parquet(parquet_cache_chunk)
+                    if is_undeduped:
+                        quad_filter.log_counts(subset_filter_dir, chunk=fname)
                 else:
                     print(f"\nProcessing {source_url}")
                     df = pl.read_csv(
@@ -168,7 +242,12 @@ def process_all_years(
                         new_columns=["line"],
                     ).select(parse_line)  # ).with_columns(parse_line) # for debugging
                     df = cap_nulls(df)
+                    if quad_filter is not None:
+                        df = dedup_chunk(df, fname=fname)
+                    df = df.with_columns(decompose_exprs)
                     df.write_parquet(parquet_cache_chunk)
+                    if quad_filter is not None:
+                        quad_filter.log_counts(subset_filter_dir, chunk=fname)
                 return parquet_cache_chunk
 
             for idx, url in enumerate(tqdm(urls)):
@@ -179,6 +258,9 @@ def process_all_years(
                 pq_caches.append(parquet_cache_chunk)
 
                 if upload_in_batches and len(pq_caches) >= batch_size:
+                    if quad_filter is not None:
+                        # Save before the uploaded chunks' local parquet is deleted
+                        quad_filter.save(subset_filter_dir)
                     upload_start_t = time.time()
                     upload_dataset(
                         pq_caches,
@@ -220,6 +302,9 @@ def process_all_years(
             # --!-- Cannot load all into RAM! --!--
             # aggregator = pl.read_parquet(pq_caches)
             if pq_caches:
+                if quad_filter is not None:
+                    # Save before the upload, as uploaded chunks are skipped on resume
+                    quad_filter.save(subset_filter_dir)
                 upload_start_t = time.time()
                 upload_dataset(
                     pq_caches,
@@ -244,6 +329,11 @@ def process_all_years(
                 upload_end_t = time.time()
                 elapsed = timedelta(seconds=int(upload_end_t - upload_start_t))
                 print(f"Successfully processed and uploaded {subset} in {elapsed}")
+            if quad_filter is not None:
+                print(
+                    f"Deduplication removed {quad_filter.dedup_rate:.2%} of {subset}"
+                    f" (~{quad_filter.fp_rate:.2%} false positive rate)"
+                )
             shutil.rmtree(subset_cache_dir)  # subset_parquet_cache_dir
 
         except KeyboardInterrupt: